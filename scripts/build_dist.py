@@ -1,85 +1,210 @@
 #!/usr/bin/env python3
 import argparse
+import gzip
 import json
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json when the wheel is unavailable
+    orjson = None
 
 API_VERSION_SUBDIR = "v1"
+# Below this many files the thread pool costs more than it saves.
+PARALLEL_MIN_FILES = 16
 
-def write_json(path: Path, data: Any, pretty: bool = True) -> None:
+def dumps_json(data: Any, pretty: bool = True) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
     if pretty:
-        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def loads_json(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def write_json(path: Path, data: Any, pretty: bool = True) -> None:
+    path.write_bytes(dumps_json(data, pretty=pretty))
+
+class BuildConfig(NamedTuple):
+    dist_dir: Path
+    write_pretty_bundle: bool
+    jobs: int
+
+class FileEntry(NamedTuple):
+    path: Path
+    rel: str
+    size: int
+
+def scan_tree(root: Path) -> List[FileEntry]:
+    entries: List[FileEntry] = []
+    stack: List[Tuple[str, str]] = [(str(root), "")]
+    while stack:
+        dir_path, prefix = stack.pop()
+        with os.scandir(dir_path) as it:
+            for e in it:
+                rel = prefix + e.name
+                if e.is_dir():
+                    stack.append((e.path, rel + "/"))
+                else:
+                    entries.append(FileEntry(Path(e.path), rel, e.stat().st_size))
+    entries.sort(key=lambda e: e.rel)
+    return entries
+
+def copy_file(src: Path, dst: Path, size: int) -> None:
+    # Like shutil.copy2, but let the kernel move the bytes when it can.
+    if hasattr(os, "copy_file_range"):
+        try:
+            with src.open("rb") as fsrc, dst.open("wb") as fdst:
+                remaining = size
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+        except OSError:
+            # EXDEV/ENOSYS/EINVAL on older kernels or filesystems; shutil uses sendfile.
+            shutil.copyfile(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+class ProcessedJson(NamedTuple):
+    path: Path
+    min_path: Path
+    min_bytes: bytes
+    keys: Optional[Tuple[str, ...]]  # top-level keys when the document is an object
+
+def is_source_json(rel: str) -> bool:
+    return rel.endswith(".json") and not rel.endswith(".min.json")
+
+def process_json_file(src: Path, dst: Path) -> Optional[ProcessedJson]:
+    # Read the source once; the same buffer is copied, parsed and minified.
+    raw = src.read_bytes()
+    dst.write_bytes(raw)
+    shutil.copystat(src, dst)
+    try:
+        obj = loads_json(raw)
+    except Exception as e:
+        print(f"Skip {dst}: {e}")
+        return None
+    min_path = dst.with_name(dst.stem + ".min.json")
+    min_bytes = dumps_json(obj, pretty=False)
+    min_path.write_bytes(min_bytes)
+    keys = tuple(obj) if isinstance(obj, dict) else None
+    return ProcessedJson(dst, min_path, min_bytes, keys)
+
+def process_json_files(srcs: List[Path], dsts: List[Path], jobs: int) -> List[ProcessedJson]:
+    if jobs > 1 and len(srcs) > PARALLEL_MIN_FILES:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(process_json_file, srcs, dsts))
     else:
-        path.write_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+        results = [process_json_file(src, dst) for src, dst in zip(srcs, dsts)]
+    return [r for r in results if r is not None]
+
+def copy_data_to_dir(entries: Iterable[FileEntry], config: BuildConfig) -> Tuple[List[Path], List[ProcessedJson]]:
+    entries = list(entries)
+    # Join each destination path once; it is needed for both mkdir and copy.
+    dsts = [config.dist_dir / e.rel for e in entries]
+    for d in sorted({dst.parent for dst in dsts}):
+        d.mkdir(parents=True, exist_ok=True)
 
-def copy_data_to_dir(src_dir: Path, dst_dir: Path) -> List[Path]:
     copied: List[Path] = []
-    for src in src_dir.rglob("*"):
-        if src.is_dir():
-            continue
-        rel = src.relative_to(src_dir)
-        dst = dst_dir / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
+    json_pairs: List[Tuple[Path, Path]] = []
+    for src, dst in zip(entries, dsts):
+        if is_source_json(src.rel):
+            json_pairs.append((src.path, dst))
+        else:
+            copy_file(src.path, dst, src.size)
         copied.append(dst)
-    return copied
 
-def minify_each_json_in_dir(root_dir: Path) -> List[Path]:
-    created: List[Path] = []
-    for p in root_dir.rglob("*.json"):
-        if p.name.endswith(".min.json"):
-            continue
-        try:
-            obj = json.loads(p.read_text(encoding="utf-8"))
-        except Exception as e:
-            print(f"Skip minifying {p}: {e}")
-            continue
-        min_path = p.with_name(p.stem + ".min.json")
-        write_json(min_path, obj, pretty=False)
-        created.append(min_path)
-    return created
-
-def build_bundle_flat(root_dir: Path, bundle_name: str = "bundle.json") -> Tuple[Path, Path]:
+    json_pairs.sort(key=lambda pair: pair[1])
+    processed = process_json_files([src for src, _ in json_pairs], [dst for _, dst in json_pairs], config.jobs)
+    return copied, processed
+
+def merge_bundle(processed: Iterable[ProcessedJson]) -> Dict[str, Any]:
     merged: Dict[str, Any] = {}
-    for p in sorted(root_dir.rglob("*.json")):
-        if p.name.endswith(".min.json"):
-            continue
-        try:
-            data = json.loads(p.read_text(encoding="utf-8"))
-            if isinstance(data, dict):
-                merged.update(data)
-            else:
-                merged[p.stem] = data
-        except Exception as e:
-            print(f"Skip bundling {p}: {e}")
-
-    out_pretty = root_dir / bundle_name
-    out_min = root_dir / (Path(bundle_name).stem + ".min.json")
+    for item in processed:
+        data = loads_json(item.min_bytes)
+        if isinstance(data, dict):
+            merged.update(data)
+        else:
+            merged[item.path.stem] = data
+    return merged
+
+def splice_bundle_min(processed: Iterable[ProcessedJson]) -> bytes:
+    # Each input is already compact JSON, so splice object bodies straight into
+    # the bundle instead of merging into one dict and re-serializing it.
+    parts: List[bytes] = []
+    for item in processed:
+        if item.keys is None:
+            parts.append(dumps_json(item.path.stem, pretty=False) + b":" + item.min_bytes)
+        elif item.keys:
+            parts.append(item.min_bytes[1:-1])
+    return b"{" + b",".join(parts) + b"}"
+
+def build_bundle_flat(
+    config: BuildConfig,
+    processed: List[ProcessedJson],
+    bundle_name: str = "bundle.json",
+) -> Tuple[Optional[Path], Path, Path]:
+    out_pretty = config.dist_dir / bundle_name
+    out_min = config.dist_dir / (Path(bundle_name).stem + ".min.json")
+    out_gz = out_min.with_name(out_min.name + ".gz")
+
+    keys = [k for item in processed for k in (item.keys if item.keys is not None else (item.path.stem,))]
+    if len(keys) == len(set(keys)):
+        min_bytes = splice_bundle_min(processed)
+        # One parse both validates the spliced bytes and feeds the pretty bundle.
+        merged = loads_json(min_bytes)
+    else:
+        # Duplicate top-level keys: splicing would emit them twice, so merge
+        # through a dict to keep "later file wins" semantics.
+        merged = merge_bundle(processed)
+        min_bytes = dumps_json(merged, pretty=False)
+    out_min.write_bytes(min_bytes)
+    # Pre-compressed copy so the CDN can serve gzip without compressing per request;
+    # mtime=0 keeps the output reproducible across builds.
+    out_gz.write_bytes(gzip.compress(min_bytes, compresslevel=9, mtime=0))
+    if not config.write_pretty_bundle:
+        # Don't leave a stale pretty bundle from an earlier build next to the new one.
+        out_pretty.unlink(missing_ok=True)
+        return None, out_min, out_gz
     write_json(out_pretty, merged, pretty=True)
-    write_json(out_min, merged, pretty=False)
-    return out_pretty, out_min
+    return out_pretty, out_min, out_gz
 
 def main():
     ap = argparse.ArgumentParser(description="Copy data/ to dist/v1, create .min.json, bundle.json & bundle.min.json.")
     ap.add_argument("--data-dir", default="data", help="Path to data directory")
     ap.add_argument("--dist-dir", default="dist", help="Path to dist directory")
+    ap.add_argument("--skip-pretty-bundle", action="store_true", help="Only emit bundle.min.json, not the indented bundle.json")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker threads for per-file JSON processing")
     args = ap.parse_args()
 
     data_dir = Path(args.data_dir).resolve()
-    dist_root = Path(args.dist_dir).resolve()
-    dist_dir = dist_root / API_VERSION_SUBDIR
-    dist_dir.mkdir(parents=True, exist_ok=True)
-
-    copied = copy_data_to_dir(data_dir, dist_dir)
-    print(f"Copied {len(copied)} files to {dist_dir}")
+    # Resolve run-wide settings once instead of re-deriving them in each step.
+    config = BuildConfig(
+        dist_dir=Path(args.dist_dir).resolve() / API_VERSION_SUBDIR,
+        write_pretty_bundle=not args.skip_pretty_bundle,
+        jobs=max(1, args.jobs),
+    )
+    config.dist_dir.mkdir(parents=True, exist_ok=True)
 
-    mins = minify_each_json_in_dir(dist_dir)
-    print(f"Created {len(mins)} minified JSONs")
+    copied, processed = copy_data_to_dir(scan_tree(data_dir), config)
+    print(f"Copied {len(copied)} files to {config.dist_dir}")
+    print(f"Created {len(processed)} minified JSONs")
 
-    bundle_path, bundle_min_path = build_bundle_flat(dist_dir, "bundle.json")
-    print(f"Bundle: {bundle_path}")
+    bundle_path, bundle_min_path, bundle_gz_path = build_bundle_flat(config, processed, "bundle.json")
+    if bundle_path:
+        print(f"Bundle: {bundle_path}")
     print(f"Bundle (min): {bundle_min_path}")
+    print(f"Bundle (min, gzip): {bundle_gz_path}")
 
 if __name__ == "__main__":
     main()
@@ -25,19 +25,30 @@ Rules:
 """
 
 import argparse
+import hashlib
 import json
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json when the wheel is unavailable
+    orjson = None
 
 # ---------------------------- Config ----------------------------------------
 
 RAW_BASE_CONTRACTS = "https://raw.githubusercontent.com/qubic/core/main/src/contracts/"
 RAW_CONTRACT_DEF   = "https://raw.githubusercontent.com/qubic/core/main/src/contract_core/contract_def.h"
 
+FETCH_WORKERS = 16
+
 # ---------------------------- Regexes ---------------------------------------
 
 REGISTER_RE = re.compile(
@@ -56,16 +67,16 @@ INCLUDE_RE = re.compile(r'#\s*include\s*["<](?P<path>[^">]+)[">]')
 CONTRACT_INDEX_RE = re.compile(r'#\s*define\s+[A-Za-z0-9_]+_CONTRACT_INDEX\s+(?P<num>\d+)\b')
 
 FIRST_QUOTED_STRING_RE = re.compile(r'"([^"]+)"')
+BRACE_RE = re.compile(r"[{}]")
+FLAT_ITEM_RE = re.compile(r"\{[^{}]*\}")
 
-BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
-LINE_COMMENT_RE  = re.compile(r"//[^\n]*")
+# Block and line comments in one alternation so the text is scanned once.
+COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*", re.DOTALL)
 
 # ---------------------------- Helpers: text/format --------------------------
 
 def strip_comments(code: str) -> str:
-    code = BLOCK_COMMENT_RE.sub("", code)
-    code = LINE_COMMENT_RE.sub("", code)
-    return code
+    return COMMENT_RE.sub("", code)
 
 def split_camel_or_snake(name: str) -> List[str]:
     if "_" in name:
@@ -133,10 +144,52 @@ def label_from_filename_with_q_rule(stem: str) -> str:
 
 # ---------------------------- Fetch from GitHub raw -------------------------
 
-def fetch_text(url: str) -> Optional[str]:
+# Shared keep-alive connection pool for all GitHub raw fetches.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_maxsize=32))
+
+def fetch_cache_path(cache_dir: Path, url: str) -> Path:
+    return cache_dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+def read_fetch_cache(path: Path) -> Optional[Dict[str, Any]]:
     try:
-        resp = requests.get(url, timeout=30)
+        cached = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or not isinstance(cached.get("body"), str):
+        return None
+    return cached
+
+def write_fetch_cache(path: Path, resp: requests.Response) -> None:
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    entry = {"url": resp.url, "etag": etag, "last_modified": last_modified, "body": resp.text}
+    try:
+        path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+    except OSError as e:
+        print(f"Warning: could not write fetch cache {path}: {e}")
+
+def fetch_text(url: str, cache_dir: Optional[Path] = None) -> Optional[str]:
+    """GET url; with cache_dir, revalidate a stored copy via If-None-Match/If-Modified-Since."""
+    cache_path = fetch_cache_path(cache_dir, url) if cache_dir else None
+    cached = read_fetch_cache(cache_path) if cache_path else None
+
+    headers: Dict[str, str] = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        resp = SESSION.get(url, headers=headers, timeout=30)
+        if resp.status_code == 304 and cached:
+            return cached["body"]
         if resp.status_code == 200:
+            if cache_path:
+                write_fetch_cache(cache_path, resp)
             return resp.text
         print(f"Warning: GET {url} -> {resp.status_code}")
     except Exception as e:
@@ -166,41 +219,10 @@ def parse_contract_def_from_raw(raw_text: str, known_contract_basenames: Optiona
             mapping[basename] = cidx
     return mapping
 
-def extract_contract_names_from_descriptions(raw_text: str) -> Dict[int, str]:
-    text = strip_comments(raw_text)
-    token = "contractDescriptions"
-    pos = text.find(token)
-    if pos == -1:
-        return {}
-    eq_pos = text.find("=", pos)
-    if eq_pos == -1:
-        return {}
-    brace_start = text.find("{", eq_pos)
-    if brace_start == -1:
-        return {}
-
-    depth = 0
-    end = brace_start
-    while end < len(text):
-        ch = text[end]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                break
-        end += 1
-    if depth != 0:
-        return {}
-
-    body = text[brace_start + 1:end]
-
+def split_brace_items(body: str) -> List[str]:
     items: List[str] = []
     i = 0
     while i < len(body):
-        if body[i].isspace() or body[i] == ",":
-            i += 1
-            continue
         if body[i] != "{":
             i += 1
             continue
@@ -216,6 +238,39 @@ def extract_contract_names_from_descriptions(raw_text: str) -> Dict[int, str]:
                     items.append(body[start:i])
                     break
             i += 1
+    return items
+
+def extract_contract_names_from_descriptions(text: str) -> Dict[int, str]:
+    """Expects comment-stripped contract_def.h text."""
+    token = "contractDescriptions"
+    pos = text.find(token)
+    if pos == -1:
+        return {}
+    eq_pos = text.find("=", pos)
+    if eq_pos == -1:
+        return {}
+    brace_start = text.find("{", eq_pos)
+    if brace_start == -1:
+        return {}
+
+    depth = 0
+    end = -1
+    for m in BRACE_RE.finditer(text, brace_start):
+        depth += 1 if m.group() == "{" else -1
+        if depth == 0:
+            end = m.start()
+            break
+    if end == -1:
+        return {}
+
+    body = text[brace_start + 1:end]
+
+    # contractDescriptions entries are flat records; only walk braces by hand
+    # if something nested shows up.
+    items = FLAT_ITEM_RE.findall(body)
+    leftover = FLAT_ITEM_RE.sub("", body)
+    if "{" in leftover or "}" in leftover:
+        items = split_brace_items(body)
 
     names: Dict[int, str] = {}
     for idx1, item in enumerate(items, start=0):
@@ -269,13 +324,16 @@ def index_to_base56(idx: int) -> str:
     return s + "A" * (56 - len(s))
 
 
-def run_js_get_identity_from_index(cidx: int, js_lib_path: Path) -> Optional[str]:
+def compute_identities_for_indices(indices: List[int], js_lib_path: Path) -> Dict[int, str]:
+    """Resolve identities for all contract indices in a single Node process."""
     js_path = js_lib_path.resolve()
     if not js_path.exists():
         print(f"Warning: JS helper not found at {js_path}; skipping identity.")
-        return None
+        return {}
+    if not indices:
+        return {}
 
-    addr56 = index_to_base56(cidx)
+    addrs = {str(cidx): index_to_base56(cidx) for cidx in indices}
 
     js_program = f"""
     (async () => {{
@@ -297,11 +355,19 @@ def run_js_get_identity_from_index(cidx: int, js_lib_path: Path) -> Optional[str
 
       const helper = new QubicHelper();
 
-      const addr = {json.dumps(addr56)};
-      const publicKey = helper.getIdentityBytes(addr);
-      const identity = await helper.getIdentity(publicKey);
-      if (typeof identity !== 'string' || identity.length !== 60) throw new Error('Invalid identity length');
-      process.stdout.write(identity);
+      const addrs = {json.dumps(addrs)};
+      const out = {{}};
+      for (const [cidx, addr] of Object.entries(addrs)) {{
+        try {{
+          const publicKey = helper.getIdentityBytes(addr);
+          const identity = await helper.getIdentity(publicKey);
+          if (typeof identity !== 'string' || identity.length !== 60) throw new Error('Invalid identity length');
+          out[cidx] = identity;
+        }} catch (e) {{
+          console.error(`index ${{cidx}}: ${{String(e && e.message || e)}}`);
+        }}
+      }}
+      process.stdout.write(JSON.stringify(out));
     }})().catch(e => {{ console.error(String(e && e.stack || e)); process.exit(1); }});
     """
 
@@ -312,13 +378,22 @@ def run_js_get_identity_from_index(cidx: int, js_lib_path: Path) -> Optional[str
             text=True,
             check=True,
         )
-        return res.stdout.strip()
     except FileNotFoundError:
         print("Warning: Node not found; skipping identity.")
+        return {}
     except subprocess.CalledProcessError as e:
         msg = e.stderr.strip() or e.stdout.strip()
         print(f"Warning: getIdentity failed: {msg}")
-    return None
+        return {}
+
+    if res.stderr.strip():
+        print(f"Warning: getIdentity failed for some indices: {res.stderr.strip()}")
+    try:
+        identities = json.loads(res.stdout)
+    except ValueError:
+        print(f"Warning: unexpected getIdentity output: {res.stdout.strip()[:200]}")
+        return {}
+    return {int(k): v for k, v in identities.items()}
 
 # ---------------------------- JSON merge/sort -------------------------------
 
@@ -406,13 +481,18 @@ def main():
     )
     ap.add_argument("--data-file", default="data/smart_contracts.json", help="Path to smart_contracts.json")
     ap.add_argument("--js-lib", default="lib/qubic-js-library.js", help="Path to qubic-js-library.js")
+    ap.add_argument("--cache-dir", default=".fetch_cache", help="Directory for conditional-GET cache (empty to disable)")
     args = ap.parse_args()
 
     data_path = Path(args.data_file).resolve()
     data_path.parent.mkdir(parents=True, exist_ok=True)
     js_lib_path = Path(args.js_lib).resolve()
+    cache_dir: Optional[Path] = None
+    if args.cache_dir:
+        cache_dir = Path(args.cache_dir).resolve()
+        cache_dir.mkdir(parents=True, exist_ok=True)
 
-    contract_def_text = fetch_text(RAW_CONTRACT_DEF)
+    contract_def_text = fetch_text(RAW_CONTRACT_DEF, cache_dir)
     if not contract_def_text:
         raise SystemExit("Could not fetch contract_def.h")
 
@@ -424,15 +504,18 @@ def main():
 
     idx_to_name = extract_contract_names_from_descriptions(stripped)
 
-    fresh_entries: List[Dict[str, Any]] = []
-    for basename in sorted(basenames):
-        cidx = idx_map.get(basename)
-        if cidx is None:
-            continue
+    targets = [(b, idx_map[b]) for b in sorted(basenames) if idx_map.get(b) is not None]
 
-        url = RAW_BASE_CONTRACTS + basename
-        text = fetch_text(url)
+    # Network-bound: fetch all contract sources concurrently, then parse locally.
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        fetch = partial(fetch_text, cache_dir=cache_dir)
+        texts = list(pool.map(fetch, [RAW_BASE_CONTRACTS + b for b, _ in targets]))
 
+    # One Node startup for every contract instead of one per index.
+    identities = compute_identities_for_indices([cidx for _, cidx in targets], js_lib_path)
+
+    fresh_entries: List[Dict[str, Any]] = []
+    for (basename, cidx), text in zip(targets, texts):
         regs: List[Tuple[int, str]] = []
         if text:
             regs = find_registers(text)
@@ -452,7 +535,7 @@ def main():
         name_value = idx_to_name.get(cidx, stem.upper())
 
         addr: Optional[str] = None
-        identity = run_js_get_identity_from_index(cidx, js_lib_path)
+        identity = identities.get(cidx)
         if identity and len(identity) == 60:
             addr = identity
         else:
@@ -471,7 +554,8 @@ def main():
         })
 
     try:
-        existing_top = json.loads(data_path.read_text(encoding="utf-8"))
+        raw = data_path.read_bytes()
+        existing_top = orjson.loads(raw) if orjson is not None else json.loads(raw)
     except Exception:
         existing_top = {}
     if not isinstance(existing_top, dict):
@@ -486,7 +570,10 @@ def main():
 
     existing_top["smart_contracts"] = merged_sc
 
-    data_path.write_text(json.dumps(existing_top, indent=2, ensure_ascii=False), encoding="utf-8")
+    if orjson is not None:
+        data_path.write_bytes(orjson.dumps(existing_top, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        data_path.write_text(json.dumps(existing_top, indent=2, ensure_ascii=False), encoding="utf-8")
     print(f"Updated {data_path} with {len(merged_sc)} smart_contract(s).")
 
 # ----------------------------------------------------------------------------